@@ -102,6 +102,46 @@ class TestTypes(SingleDictTest):
     self.failtest('bf', '1.1')
     self.failtest('e', 'x')
 
+class TestBool(unittest.TestCase):
+  def test_basic(self):
+    for x in '', '0', 'false', 'False', 'NO', 'Off':
+      assert validate(types.Bool(), x) is False
+    for x in '1', 'true', 'TRUE', 'yes', 'anything':
+      assert validate(types.Bool(), x) is True
+    self.assertRaises(AttributeError, validate, types.Bool(), ['x'])
+
+class TestEnum(unittest.TestCase):
+  def test_unhashable(self):
+    assert validate(types.Enum(([1], [2])), [2]) == [2]
+    try:
+      validate(types.Enum(('a', 'b')), ['a'])
+      er = False
+    except types.Error, e:
+      er = e.format()
+    assert er == 'value is not a valid value'
+
+class TestNumberSubclass(unittest.TestCase):
+  def test_init(self):
+    class Pct(types.BoundedFloat):
+      __slots__ = ()
+      def __init__(self): self.valrange = 0, 100
+    assert validate(Pct(), '50') == 50.0
+    try:
+      validate(Pct(), 'x')
+      er = False
+    except types.Error, e:
+      er = e.format()
+    assert er == 'value is not a valid float'
+
+class TestStrSubclass(unittest.TestCase):
+  def test_init(self):
+    class MyStr(types.Str):
+      __slots__ = ()
+      def __init__(self): self.lenrange = types.LenRange('characters', 3, 5)
+    class MyStrDict(types.Dict):
+      s = MyStr(), types.fromtype
+    assert validate(MyStrDict, {}) == dict(s='\x00' * 3)
+
 class TestSub(SingleDictTest):
   def setUp(self):
     class TestDict(types.Dict):
@@ -134,6 +174,31 @@ class TestDefault(SingleDictTest):
     assert v['a'] == 'yeah'
     assert v['b'] == ''
 
+  def test_mutable(self):
+    class MutableDefaultTest(types.Dict):
+      l = types.List(types.Int()), types.fromtype
+    v1 = validate(MutableDefaultTest, {})
+    v2 = validate(MutableDefaultTest, {})
+    assert v1['l'] == [] and v1['l'] is not v2['l']
+
+  def test_fresh(self):
+    class Counter(types.Base):
+      __slots__ = 'n',
+      def __init__(self): self.n = 0
+      def _default(self):
+        self.n += 1
+        return self.n
+    class FreshDefaultTest(types.Dict):
+      c = Counter(), types.fromtype
+      s = types.Str(2, 5), types.fromtype
+    assert FreshDefaultTest._fieldmap['s'].default == '\x00\x00'
+    assert validate(FreshDefaultTest, {})['c'] == 1
+    assert validate(FreshDefaultTest, {})['c'] == 2
+    # A failing default only fails when it is needed.
+    class BadDefaultTest(types.Dict):
+      e = types.Enum(()), types.fromtype
+    self.assertRaises(IndexError, validate, BadDefaultTest, {})
+
 class TestSubDefault(SingleDictTest):
   def setUp(self):
     class DefaultDictTest(types.Dict):
@@ -154,6 +219,19 @@ class TestSubDefault(SingleDictTest):
     assert v
     assert v['a'] == 'ooh'
 
+class TestOrder(unittest.TestCase):
+  def test_errors(self):
+    class OrderTest(types.Dict):
+      c = types.Int()
+      a = types.Int()
+      b = types.Int()
+    try:
+      validate(OrderTest, {})
+      er = False
+    except types.Error, e:
+      er = e.format()
+    assert er == 'a is required, b is required, and c is required'
+
 class TestSeq(unittest.TestCase):
   def test_list(self):
     v = validate(types.List(types.Int()), ['1', '2'])
@@ -185,6 +263,70 @@ class TestSeq(unittest.TestCase):
     assert er
     if show_errors: print er
 
+  def test_long(self):
+    n = types.List.vectormin * 2
+    v = validate(types.List(types.Int()), [str(i) for i in xrange(n)])
+    assert v == range(n)
+    assert all(type(x) is int for x in v)
+    v = validate(types.Tuple(types.Float()), ('1.5',) * n)
+    assert v == (1.5,) * n
+    try:
+      validate(types.List(types.Int()), ['1'] * n + ['foo'])
+      er = False
+    except types.Error, e:
+      er = e.format()
+    assert er == '[%s] is not a valid int' % n
+
+  def test_lenrange(self):
+    for args, msg in (
+        ((2,), 'no more than 2 elements'),
+        ((1, 2), 'between 1 and 2 elements'),
+        ((3, 3), 'exactly 3 elements')):
+      try:
+        validate(types.List(types.Int(), *args), [1] * 4)
+        er = False
+      except types.Error, e:
+        er = e.format()
+      assert er == 'value must be %s' % msg
+
+  def test_vector_strings(self):
+    # String input must be turned away before any array is built.
+    class FakeNumpy(object):
+      int64 = float64 = None
+      def array(self, v): raise AssertionError('array built')
+    numpy, types.numpy = types.numpy, FakeNumpy()
+    try:
+      assert types.List(types.Int())._vectorcheck(['1', '2']) is None
+      assert types.List(types.Float())._vectorcheck([u'1.5']) is None
+    finally:
+      types.numpy = numpy
+
+  @unittest.skipIf(types.numpy is None, 'needs NumPy')
+  def test_vector(self):
+    n = types.List.vectormin
+    v = validate(types.List(types.Int()), range(n))
+    assert v == range(n)
+    assert all(type(x) is int for x in v)
+    v = validate(types.List(types.Float()), range(n))
+    assert v == map(float, range(n))
+    assert all(type(x) is float for x in v)
+    # Input NumPy would convert differently falls back to int/float.
+    assert validate(types.List(types.Int()), [1.5] * n) == [1] * n
+    big = 2 ** 70
+    assert validate(types.List(types.Int()), [big] * n) == [big] * n
+    assert validate(types.List(types.Int()), [True] * n) == [1] * n
+    for typ, bad in (
+        (types.Int(), [[1]] * n),
+        (types.Int(), [1] * (n - 1) + [None]),
+        (types.Int(), ['1\x00'] * n),
+        (types.Float(), ['1.5\x00'] * n)):
+      try:
+        validate(types.List(typ), bad)
+        er = False
+      except (types.Error, TypeError), e:
+        er = True
+      assert er
+
 class TestSubDict(unittest.TestCase):
   def test_basic(self):
     class TestDict(types.Dict):
@@ -256,4 +398,115 @@ class TestOptional(unittest.TestCase):
     data = validate(Dict, dict(a=1, b=dict(a=3)), optional=True)
     assert data == dict(a=1, b=dict(a=3))
 
+  def test_list(self):
+    class SubDict(types.Dict):
+      a = types.Int()
+    class Dict(types.Dict):
+      l = types.List(SubDict)
+    data = validate(Dict, dict(l=[{}, dict(a='1')]), optional=True)
+    assert data == dict(l=[{}, dict(a=1)])
+
+  def test_errors(self):
+    class Dict(types.Dict):
+      b = types.Int()
+      a = types.Int()
+      c = types.Int()
+    try:
+      validate(Dict, dict(c='x', a='y', z='w'), optional=True)
+      er = False
+    except types.Error, e:
+      er = e.format()
+    assert er == 'a is not a valid int and c is not a valid int'
+
+class TestCache(unittest.TestCase):
+  def test_basic(self):
+    class CacheTest(types.Dict):
+      _cachesize = 2
+      a = types.Int()
+      l = types.List(types.Int()), types.fromtype
+    v1 = validate(CacheTest, dict(a='1'))
+    v1['l'].append(3)
+    v2 = validate(CacheTest, dict(a='1'))
+    assert v2 == dict(a=1, l=[])
+    assert len(CacheTest._cache) == 1
+    # Same data but different types must not share an entry.
+    assert validate(CacheTest, dict(a=1.5)) == dict(a=1, l=[])
+    assert len(CacheTest._cache) == 2
+    validate(CacheTest, dict(a='2'))
+    assert len(CacheTest._cache) == 2
+    # Unhashable input is validated without the cache.
+    assert validate(CacheTest, dict(a='1', x=set())) == dict(a=1, l=[])
+    try:
+      validate(CacheTest, dict(a='x'))
+      er = False
+    except types.Error, e:
+      er = e.format()
+    assert er == 'a is not a valid int'
+
+  def test_fresh(self):
+    class Split(types.Base):
+      __slots__ = ()
+      def _check(self, v, **kw): return v.split(',')
+    class CacheTest(types.Dict):
+      _cachesize = 2
+      s = Split()
+    v1 = validate(CacheTest, dict(s='a,b'))
+    v1['s'].append('c')
+    v2 = validate(CacheTest, dict(s='a,b'))
+    v2['s'].append('d')
+    assert validate(CacheTest, dict(s='a,b')) == dict(s=['a', 'b'])
+
+  def test_unflat(self):
+    class SubTest(types.Dict):
+      x = types.Int()
+    class CacheTest(types.Dict):
+      _cachesize = 2
+      l = types.List(types.Int())
+      sub = SubTest, None
+      t = types.Tuple(types.Int()), ()
+    assert validate(CacheTest, dict(l=['1'], sub=dict(x='2'), t=(3,))) == \
+      dict(l=[1], sub=dict(x=2), t=(3,))
+    assert not CacheTest._cache
+
+  def test_override(self):
+    class CacheTest(types.Dict):
+      _cachesize = 2
+      a = types.Int()
+    class CheckTest(CacheTest):
+      d = types.Int()
+      @classmethod
+      def _check(cls, v, **kw):
+        ret = super(CheckTest, cls)._check(v, **kw)
+        ret['extra'] = True
+        return ret
+    for i in 1, 2:
+      assert validate(CheckTest, dict(a=1, d=2)) == \
+        dict(a=1, d=2, extra=True)
+    assert super(CheckTest, CheckTest)._check(dict(a=1, d=2)) == \
+      dict(a=1, d=2)
+
+  def test_zero(self):
+    class CacheTest(types.Dict):
+      _cachesize = 2
+      f = types.Float()
+    assert str(validate(CacheTest, dict(f=0.0))['f']) == '0.0'
+    assert str(validate(CacheTest, dict(f=-0.0))['f']) == '-0.0'
+
+  def test_negative(self):
+    class CacheTest(types.Dict):
+      _cachesize = -1
+      a = types.Int()
+    assert validate(CacheTest, dict(a='1')) == dict(a=1)
+    assert CacheTest._cache is None
+
+  def test_sub(self):
+    class CacheTest(types.Dict):
+      _cachesize = 2
+      a = types.Int()
+    class NoCacheTest(CacheTest):
+      _cachesize = 0
+    validate(NoCacheTest, dict(a='1'))
+    assert NoCacheTest._cache is None
+    assert not CacheTest._cache
+
 unittest.main()
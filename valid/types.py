@@ -11,11 +11,20 @@ objects in this libarary, and it's a minor performance gain.  More
 importantly, though, (2) it makes the Pydoc documentation easier to
 read.
 
+If NumPy is installed, long Lists and Tuples of plain Ints or Floats
+are converted in bulk with it.  NumPy is optional; without it they are
+checked one element at a time as usual.
+
 Project authors are encouraged to subclass any of the classes in this
 module and build their own application-specific ones as needed.
 '''
 
-from .util import kooljoin
+from functools import partial
+
+from .util import copyvalue, kooljoin, recordkey
+
+try: import numpy
+except ImportError: numpy = None
 
 fromtype = object()
 
@@ -38,17 +47,15 @@ class Error(Exception):
     error message.
 
     '''
+    # The errors are passed on as args too: str(), tracebacks and
+    # pickling all rely on them.
     super(Error, self).__init__(*errors)
     self.errors = errors
 
   def format(self):
     '''Return human-readable phrase summarizing errors.'''
-    ret = ()
-    for path, msg in self.errors:
-      path = path.lstrip('.')
-      if not path: path = 'value'
-      ret += '%s %s' % (path, msg),
-    return kooljoin('and', ret)
+    return kooljoin('and', ['%s %s' % (path.lstrip('.') or 'value', msg)
+      for path, msg in self.errors])
 
 class Base(object):
   '''Base is the base class for valid types (except Dict; see below).
@@ -64,16 +71,23 @@ class Base(object):
   the error was detected.  Generally, "scalar" errors (Int, Str, etc.)
   pass up an empty path, and "vector" errors (Dict, List, etc.) fill in
   and handle the path.
+
+  Containers only pass the keyword arguments of the validate call on to
+  types whose _needskw class attribute is true; other types have their
+  check method called with the value alone.  Set it in any type that
+  reads those arguments or hands them on to other types.
   '''
   __slots__ = ()
 
+  _needskw = False
+
   def _default(self): raise NotImplementedError()
   def _check(self, v, **kw): raise NotImplementedError()
 
 class LenRange(Base):
   '''Provide one argument to give an upper bound only.'''
 
-  __slots__ = 'word', 'range'
+  __slots__ = 'word', 'min', 'max', 'errmsg'
 
   def __init__(self, word, min, max=None):
     '''If you pass only min, it will be used as an upper bound
@@ -81,18 +95,17 @@ class LenRange(Base):
     '''
     self.word = word
     if max is None: min, max = 0, min
-    self.range = xrange(min, max + 1)
+    self.min, self.max = min, max
+    if min == max: s = 'exactly %s %s' % (min, word)
+    elif min: s = 'between %s and %s %s' % (min, max, word)
+    else: s = 'no more than %s %s' % (max, word)
+    self.errmsg = 'must be %s' % s
 
   def _check(self, v, **kw):
     try: x = len(v)
     except TypeError:
       raise Error(('', 'has no length defined'))
-    if x not in self.range:
-      min, max = self.range[0], self.range[-1]
-      if min == max: s = 'exactly %s %s' % (min, self.word)
-      if min: s = 'between %s and %s %s' % (min, max, self.word)
-      else: s = 'no more than %s %s' % (max, self.word)
-      raise Error(('', 'must be %s' % s))
+    if x < self.min or x > self.max: raise Error(('', self.errmsg))
     return v
 
 class NumberBase(Base):
@@ -126,7 +139,10 @@ class BoundedNumber(NumberBase):
   def _default(self): return self.valrange[0]
 
   def _check(self, v, **kw):
-    v = super(BoundedNumber, self)._check(v, **kw)
+    # Same conversion as NumberBase._check, inlined to save a call.
+    try: v = self.cls(v)
+    except ValueError:
+      raise Error(('', 'is not a valid %s' % self.cls.__name__))
     if not (self.valrange[0] <= v <= self.valrange[1]):
       raise Error(('', 'must be between %s and %s' %  self.valrange))
     return v
@@ -156,20 +172,32 @@ class Bool(Base):
   def _default(self): return False
 
   def _check(self, v, **kw):
-    if not v or v.lower() in self.falsevalues: return False
-    return True
+    if not v: return False
+    # Try the value as given first so that lowercase false values skip
+    # building a lowered copy; anything else still needs one.  For
+    # unhashable values, lower() below raises as it always has.
+    try:
+      if v in self.falsevalues: return False
+    except TypeError: pass
+    return v.lower() not in self.falsevalues
 
 class Enum(Base):
-  __slots__ = 'items',
+  __slots__ = 'items', 'itemset'
 
   def __init__(self, itr):
     '''Pass an iterable of items to use for the enumeration.'''
     self.items = tuple(itr)
+    # Check membership against a set when the items allow it.
+    try: self.itemset = frozenset(self.items)
+    except TypeError: self.itemset = self.items
 
   def _default(self): return self.items[0]
 
   def _check(self, v, **kw):
-    if v not in self.items: raise Error(('', 'is not a valid value'))
+    # An unhashable value cannot be in a set of hashable items.
+    try: ok = v in self.itemset
+    except TypeError: ok = False
+    if not ok: raise Error(('', 'is not a valid value'))
     return v
 
 class StrBase(Base):
@@ -184,7 +212,7 @@ class StrBase(Base):
     '''If you pass a single value, it will be an upper bound.'''
     self.lenrange = LenRange('characters', min, max)
 
-  def _default(self): return self.defchar * self.lenrange.range[0]
+  def _default(self): return self.defchar * self.lenrange.min
 
   def _check(self, v, **kw):
     v = self.lenrange._check(v, **kw)
@@ -209,6 +237,12 @@ class SeqBase(Base):
 
   __slots__ = 'lenrange', 'type'
 
+  _needskw = True
+
+  # Sequences at least this long are converted in bulk with NumPy when
+  # possible; see _vectorcheck.
+  vectormin = 1000
+
   def __init__(self, typ, min=None, max=None):
     '''If you pass only min, it will be used as a length upper bound.
     If you provide min None (the default), no length range checking will
@@ -221,19 +255,54 @@ class SeqBase(Base):
 
   def _default(self): return self.cls()
 
+  def _vectorcheck(self, v):
+    '''Try to convert v in bulk with NumPy.  Only plain Int and Float
+    element types are handled.  Returns None for any other element type,
+    or for input NumPy does not convert the same way int or float would,
+    so that the caller falls back to checking one element at a time
+    (which is also what builds the error paths).
+    '''
+
+    typ = type(self.type)
+    # Only numeric input is handled.  Strings are left to the elementwise
+    # path: NumPy drops trailing NULs from them, and parsing them gains
+    # next to nothing.  Floats and big or unsigned integers are left to
+    # it too for Int, so truncation and overflow behave like int.
+    if typ is Int:
+      kinds, dtype, first = 'bi', numpy.int64, (int, long, bool)
+    elif typ is Float:
+      kinds, dtype, first = 'biuf', numpy.float64, (int, long, bool, float)
+    else: return None
+    # Building the array is the expensive part, so first rule out the
+    # common non-numeric input (lists of strings) from its first item.
+    if type(v[0]) not in first: return None
+    try:
+      a = numpy.array(v)
+      if a.ndim != 1 or a.dtype.kind not in kinds: return None
+      return a.astype(dtype).tolist()
+    except (ValueError, TypeError, OverflowError):
+      return None
+
   def _check(self, v, **kw):
     if not isinstance(v, self.cls):
       raise Error(('', 'is not a %s' % self.cls.__name__))
 
     if self.lenrange is not None:
       v = self.lenrange._check(v, **kw)
-    ret = ()
-    bad = ()
+    if numpy is not None and len(v) >= self.vectormin:
+      ret = self._vectorcheck(v)
+      if ret is not None: return self.cls(ret)
+    ret = []
+    bad = None # Only built once something fails.
+    # Look these up once rather than per element.
+    check, append = self.type._check, ret.append
+    if kw and self.type._needskw: check = partial(check, **kw)
     for i, x in enumerate(v):
-      try: ret += self.type._check(x, **kw),
+      try: append(check(x))
       except Error, e:
+        if bad is None: bad = []
         for path, msg in e.errors:
-          bad += ('[%s]%s' % (i, path), msg),
+          bad.append(('[%s]%s' % (i, path), msg))
     if bad: raise Error(*bad)
     return self.cls(ret)
 
@@ -244,14 +313,70 @@ class List(SeqBase):
   __slots__ = ()
   cls = list
 
+class Field(object):
+  '''Internal resolved field spec for Dict.  The optional attribute
+  says whether the field had a default; fromtype says whether that
+  default must still be taken from the type at validation time; fresh
+  says whether the field's validated value may be mutable, and so must
+  be copied or rebuilt when handed out from a Dict's cache.
+  '''
+
+  __slots__ = (
+    'name', 'type', 'check', 'needskw', 'optional', 'default', 'fromtype',
+    'fresh')
+
+  # The _default methods of this module that always return the same
+  # immutable value for a given type object, so they can be called once
+  # when the Dict is built.  SeqBase's qualifies only for tuples.
+  constdefaults = frozenset(cls.__dict__['_default']
+    for cls in (StrBase, NumberBase, BoundedNumber, Bool, Enum))
+  # The _check methods of this module that return immutable values (or,
+  # for Enum, the hashable input itself).
+  constchecks = frozenset(cls.__dict__['_check']
+    for cls in (StrBase, NumberBase, BoundedNumber, Bool, Enum))
+
+  def __init__(self, name, spec):
+    '''Pass the field name and its normalized spec tuple.'''
+    self.name = name
+    self.type = spec[0]
+    # Bound once here to save the method lookup per validated field.
+    self.check = self.type._check
+    self.needskw = self.type._needskw
+    self.optional = len(spec) == 2
+    if self.optional: self.default = spec[1]
+    else: self.default = None
+    self.fromtype = self.default is fromtype
+    if self.fromtype and self.isconstdefault(self.type):
+      # Resolve the type's default now.  If it fails, leave it to fail
+      # at validation time, when the default is actually needed.
+      try: default = self.type._default()
+      except Exception: pass
+      else: self.default, self.fromtype = default, False
+    check = getattr(type(self.type), '_check', None)
+    check = getattr(check, 'im_func', None)
+    self.fresh = self.fromtype or check not in self.constchecks
+
+  @classmethod
+  def isconstdefault(cls, typ):
+    '''Whether the default of typ can be computed once and shared.
+    Other types, including user ones, may build a fresh or changing
+    value on each call, so they are left alone.
+    '''
+
+    if not isinstance(typ, Base): return False
+    func = getattr(type(typ)._default, 'im_func', None)
+    if func is SeqBase.__dict__['_default']: return typ.cls is tuple
+    return func in cls.constdefaults
+
 class DictType(type):
   '''Internal metaclass for Dict.'''
 
   def __init__(self, name, bases, dct):
     if '__metaclass__' in dct: return # Base class; ignore.
     t = set()
-    # The types set stored with name _types so as not to collide with
-    # class attributes users might use.
+    # The field names are stored with name _types so as not to collide
+    # with class attributes users might use.  They are kept as a sorted
+    # tuple so that fields (and so errors) come out in a stable order.
     for cls in bases:
       if hasattr(cls, '_types'): t.update(cls._types)
     # Since Dicts are special, specially handle them.
@@ -263,7 +388,15 @@ class DictType(type):
         # Normalize all specs to be tuples.
         setattr(self, name, (spec,))
         t.add(name)
-    self._types = t
+    self._types = t = tuple(sorted(t))
+    # Resolve each field's spec once here rather than on every _check
+    # call.
+    self._fields = tuple(Field(name, getattr(self, name)) for name in t)
+    self._fieldmap = dict((field.name, field) for field in self._fields)
+    # Each caching class gets its own cache.
+    if self._cachesize > 0: self._cache = {}
+    else: self._cache = None
+    self._freshfields = tuple(field for field in self._fields if field.fresh)
 
 class Dict(object):
   '''Dicts are a bit special.  Instead of creating instances of them
@@ -277,11 +410,27 @@ class Dict(object):
   Dicts support a keyword boolean 'optional' in the validate call that
   causes *all* fields to be treated as optional, even if not
   individually specified as such.
+
+  Set the class attribute _cachesize to a positive number to cache up
+  to that many results, keyed on the input data, and return a copy of
+  the cached result when the same data is validated again.  This is off
+  by default.  Only flat records are cached: ones whose values are all
+  strings, numbers, bools or None (see util.recordkey).  Anything else,
+  and any failed validation, is simply validated each time.  When the
+  cache is full an arbitrary entry is dropped.  Each cache access is a
+  single dict operation, so it is safe to validate from several threads.
+  Use it where many identical records with more than a few fields are
+  validated; for very small records a cache hit costs about as much as
+  validating.  Literal default values are shared between results just
+  as without caching.
   '''
 
   __metaclass__ = DictType
   # No slots.
 
+  _needskw = True
+  _cachesize = 0
+
   def __init__(self):
     '''Don't call this; it will throw an error.  You are meant to use
     just Dict classes.
@@ -305,32 +454,68 @@ class Dict(object):
 
     if not isinstance(v, dict): raise Error(('', 'is not a dict'))
 
-    ret = {}
-    bad = ()
-
-    for name in cls._types:
-      spec = getattr(cls, name)
+    key = None
+    cache = cls._cache
+    if cache is not None:
+      key = recordkey(v, kw)
+      if key is not None:
+        ret = cache.get(key)
+        if ret is not None:
+          if cls._freshfields: return cls._cachecopy(ret, v)
+          return dict(ret)
+
+    if optional:
+      # Missing fields are skipped in optional mode, so only visit the
+      # ones present.  Sorting them keeps the order of _fields.
+      if not v: return {}
+      fieldmap = cls._fieldmap
+      fields = [fieldmap[name]
+        for name in sorted(name for name in v if name in fieldmap)]
+    else: fields = cls._fields
 
-      if len(spec) == 2:
-        opt = True
-        default = spec[1]
-      else:
-        opt = False
-      typ = spec[0]
+    ret = {}
+    bad = None # Only built once something fails.
 
+    for field in fields:
+      name = field.name
       if name not in v:
         if not optional:
-          if opt:
-            if default is fromtype: ret[name] = typ._default()
-            else: ret[name] = default
+          if field.optional:
+            if field.fromtype: ret[name] = field.type._default()
+            else: ret[name] = field.default
           else:
-            bad += ('.' + name, 'is required'),
+            if bad is None: bad = []
+            bad.append(('.' + name, 'is required'))
       else:
         try:
-          ret[name] = typ._check(v[name], **kw)
+          if field.needskw: ret[name] = field.check(v[name], **kw)
+          else: ret[name] = field.check(v[name])
         except Error, e:
+          if bad is None: bad = []
           for path, msg in e.errors:
-            bad += ('.' + name + path, msg),
+            bad.append(('.' + name + path, msg))
 
     if bad: raise Error(*bad)
+    if key is not None:
+      if len(cache) >= cls._cachesize:
+        # Another thread may have emptied it meanwhile.
+        try: cache.popitem()
+        except KeyError: pass
+      cache[key] = cls._cachecopy(ret, v)
+    return ret
+
+  @classmethod
+  def _cachecopy(cls, ret, v):
+    '''Copy a result going into or out of the cache, so that callers
+    changing what they get back cannot change the cached result.  Only
+    the values of fresh fields (see Field) can be mutable, so only those
+    are copied or rebuilt.
+    '''
+
+    ret = dict(ret)
+    for field in cls._freshfields:
+      name = field.name
+      if name not in ret: continue
+      if name in v: ret[name] = copyvalue(ret[name])
+      elif field.fromtype: ret[name] = field.type._default()
     return ret
@@ -12,6 +12,42 @@ def kooljoin(word, seq):
 
   word += ' '
   if len(seq) < 3: return (' ' + word).join(seq)
-  seq = list(seq)
-  seq[-1] = word + seq[-1]
-  return ', '.join(seq)
+  # Slice lists and tuples directly; other sized iterables need a copy.
+  if not isinstance(seq, (list, tuple)): seq = list(seq)
+  return ', '.join(seq[:-1]) + ', ' + word + seq[-1]
+
+# Value types recordkey accepts: hashable scalars whose equal values
+# always validate alike once their type is known.
+keytypes = frozenset((str, unicode, int, long, bool, float, type(None)))
+
+def recordkey(d, kw):
+  '''Return a hashable key standing for validating dict d with keyword
+  arguments kw, or None if some value of d is not one of keytypes or kw
+  is unhashable.  Each value's type is part of the key, so that, for
+  example, 1, 1.0 and True are kept apart.
+  '''
+
+  # Built from C-level calls, as this runs on every cached validation.
+  # A dict lists its keys and values in the same order, so zip lines up
+  # each key with its value and that value's type.
+  values = d.values()
+  types = map(type, values)
+  if not keytypes.issuperset(types): return None
+  if float in types:
+    # 0.0 and -0.0 compare equal; their reprs do not.
+    values = [repr(x) if type(x) is float else x for x in values]
+  key = frozenset(zip(d, values, types))
+  if not kw: return key
+  try: return key, frozenset(kw.iteritems())
+  except TypeError: return None
+
+def copyvalue(v):
+  '''Copy the dicts, lists and tuples of plain data, recursively.  Any
+  other objects are shared with the original rather than copied.
+  '''
+
+  t = type(v)
+  if t is dict: return dict((k, copyvalue(x)) for k, x in v.iteritems())
+  if t is list: return [copyvalue(x) for x in v]
+  if t is tuple: return tuple(copyvalue(x) for x in v)
+  return v